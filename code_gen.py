@@ -0,0 +1,208 @@
+"""
+Shared activation code generation for the generate_*_codes.py scripts
+Codes look like GNP-XXXX-XXXX-XXXX (parts=3) or GNP-XXXX-XXXX-XXXX-XXXX (parts=4)
+"""
+import io
+import json
+import mmap
+import os
+import string
+from functools import lru_cache
+from operator import itemgetter
+
+try:
+    import orjson  # optional: C implementation of the JSON encoder
+except ImportError:
+    orjson = None
+
+ALPHABET = (string.ascii_uppercase + string.digits).encode()
+PART_LENGTH = 4
+# 256-entry bytes.translate table mapping every random byte to an ALPHABET character
+_LOOKUP = bytes(ALPHABET[b % len(ALPHABET)] for b in range(256))
+# 252 = 36 * 7: larger bytes are deleted by translate so `b % 36` stays uniform
+_UNBIASED_LIMIT = 256 - 256 % len(ALPHABET)
+_REJECTED = bytes(range(_UNBIASED_LIMIT, 256))
+
+def _random_chars(n):
+    """Return n random ALPHABET characters drawn from os.urandom"""
+    urandom, lookup, rejected = os.urandom, _LOOKUP, _REJECTED
+    out = bytearray()
+    while len(out) < n:
+        missing = n - len(out)
+        # Over-read by more than the 4/256 rejection rate so a single
+        # os.urandom syscall almost always covers the whole batch
+        out += urandom(missing + missing // 32 + 16).translate(lookup, rejected)
+    return out[:n].decode('ascii')
+
+@lru_cache(maxsize=None)
+def _code_splitter(parts, prefix):
+    """Build, once per (parts, prefix), a function splitting random chars into codes"""
+    width = parts * PART_LENGTH
+    # itemgetter of slices cuts all parts of one code in a single C call
+    # (with one slice it returns a bare str, not a tuple)
+    slices = [slice(j, j + PART_LENGTH) for j in range(0, width, PART_LENGTH)]
+    cut_parts = itemgetter(*slices) if parts > 1 else (lambda chunk: (chunk,))
+    fmt = (prefix + '-{}' * parts).format
+
+    def split(s):
+        return [fmt(*cut_parts(s[i:i + width])) for i in range(0, len(s), width)]
+
+    return width, split
+
+def make_batch(count, parts=3, prefix='GNP'):
+    """Generate count unique codes, re-drawing only to replace duplicates"""
+    width, split = _code_splitter(parts, prefix)
+    codes = set()
+    while len(codes) < count:
+        codes.update(split(_random_chars((count - len(codes)) * width)))
+    return list(codes)
+
+class CodeBatch:
+    """A batch of code records stored column-wise
+
+    Only the code strings are stored per record; days, expiry_date, status,
+    created_at (and type) are shared by the whole batch and kept once in
+    fields. Record dicts are built on demand while iterating, which is what
+    write_json/write_jsonl do, so they never all live in memory at once.
+    """
+    __slots__ = ('codes', 'fields')
+
+    def __init__(self, codes, fields):
+        self.codes = codes
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        # dict.copy() of a prebuilt template, with 'code' kept as the first key
+        template = {'code': None, **self.fields}
+        for code in self.codes:
+            record = template.copy()
+            record['code'] = code
+            yield record
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CodeBatch(self.codes[index], self.fields)
+        return {'code': self.codes[index], **self.fields}
+
+# Outputs up to one chunk are written normally; beyond that, full page-aligned
+# chunks go to disk with O_DIRECT, skipping the extra page-cache copy
+DIRECT_IO_CHUNK = 1 << 20
+_O_DIRECT = getattr(os, 'O_DIRECT', 0)  # Linux only
+_O_BINARY = getattr(os, 'O_BINARY', 0)  # Windows only
+
+class _DirectFileIO(io.RawIOBase):
+    """Raw writer staging bytes in an anonymous (page-aligned) mmap buffer"""
+
+    def __init__(self, path):
+        super().__init__()
+        self._path = path
+        self._buf = mmap.mmap(-1, DIRECT_IO_CHUNK)
+        self._used = 0
+        self._size = 0
+        self._fd = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        with memoryview(data) as view:
+            view = view.cast('B')
+            done = 0
+            while done < len(view):
+                n = min(len(view) - done, DIRECT_IO_CHUNK - self._used)
+                self._buf[self._used:self._used + n] = view[done:done + n]
+                self._used += n
+                done += n
+                if self._used == DIRECT_IO_CHUNK:
+                    self._flush_chunk(DIRECT_IO_CHUNK)
+            return done
+
+    def _flush_chunk(self, length):
+        if self._fd is None:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_BINARY
+            try:
+                self._fd = os.open(self._path, flags | _O_DIRECT, 0o644)
+            except OSError:  # e.g. tmpfs rejects O_DIRECT
+                self._fd = os.open(self._path, flags, 0o644)
+        with memoryview(self._buf) as view, view[:length] as chunk:
+            written = 0
+            while written < length:
+                written += os.write(self._fd, chunk[written:])
+        self._size += min(length, self._used)
+        self._used = 0
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._fd is None:
+                # small output: not worth bypassing the page cache
+                with open(self._path, 'wb') as f, memoryview(self._buf) as view:
+                    f.write(view[:self._used])
+            else:
+                if self._used:
+                    # O_DIRECT needs block-sized writes: pad the tail, then cut it off
+                    padded = -(-self._used // mmap.PAGESIZE) * mmap.PAGESIZE
+                    self._buf[self._used:padded] = bytes(padded - self._used)
+                    self._flush_chunk(padded)
+                os.ftruncate(self._fd, self._size)
+                os.close(self._fd)
+        finally:
+            self._buf.close()
+            super().close()
+
+def _open_output(path):
+    """Binary, 1 MiB-buffered writer for generated code files"""
+    return io.BufferedWriter(_DirectFileIO(path), buffer_size=DIRECT_IO_CHUNK)
+
+def _dumps_record(record):
+    """Encode one record as indent=2 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_INDENT_2)
+    return json.dumps(record, ensure_ascii=False, indent=2).encode('utf-8')
+
+def write_json(path, records):
+    """Stream records to path as an indent=2 JSON array, one record at a time
+
+    The output is byte-identical to json.dump(list(records), f, indent=2),
+    but only one encoded record is held in memory, so records may be a
+    generator. Returns the number of records written.
+    """
+    count = 0
+    with _open_output(path) as f:
+        for record in records:
+            f.write(b',\n  ' if count else b'[\n  ')
+            # nest the record's own indent=2 lines one level inside the array
+            f.write(_dumps_record(record).replace(b'\n', b'\n  '))
+            count += 1
+        f.write(b'\n]' if count else b'[]')
+    return count
+
+def read_json(path):
+    """Load a JSON file written by write_json (orjson when available)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def write_jsonl(path, records):
+    """Stream records to path as JSON Lines: one compact object per line
+
+    For bulk consumers that parse line by line; the app itself still loads
+    the indent=2 arrays from write_json. Returns the number of records written.
+    """
+    if orjson is not None:
+        dumps = orjson.dumps
+    else:
+        def dumps(record):
+            return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    count = 0
+    with _open_output(path) as f:
+        for record in records:
+            f.write(dumps(record) + b'\n')
+            count += 1
+    return count
@@ -0,0 +1,104 @@
+"""
+Parameterized activation code generator behind the generate_*_codes.py scripts
+
+Usage:
+    python generate.py --count 100 --days 30 --parts 3 --out valid_codes.json
+    python generate.py --count 10 --days 36500 --parts 4 --type lifetime --out valid_codes_lifetime.json
+    python generate.py --count 100000 --days 30 --format jsonl --out codes.jsonl
+    python generate.py --preset 3days
+    python generate.py --all          # every preset, in parallel worker processes
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from code_gen import CodeBatch, make_batch, write_json, write_jsonl
+
+LIFETIME_DAYS = 36500  # ~100 years
+
+# name -> (count, days, parts, code_type, out)
+PRESETS = {
+    'monthly': (100, 30, 3, 'standard', 'valid_codes.json'),                 # generate_codes.py
+    '3days': (20, 3, 3, 'standard', 'valid_codes_3days.json'),               # generate_3days_codes.py
+    '5days': (50, 5, 4, 'standard', 'valid_codes_5days.json'),               # generate_5days_codes.py
+    'lifetime': (10, LIFETIME_DAYS, 4, 'lifetime', 'valid_codes_lifetime.json'),  # generate_lifetime_codes.py
+    # generate_all_codes_4parts.py
+    'app_30days': (100, 30, 3, 'standard', 'assets/activation_codes/valid_codes.json'),
+    'app_5days': (50, 5, 3, 'standard', 'assets/activation_codes/valid_codes_5days.json'),
+    'app_lifetime': (10, LIFETIME_DAYS, 3, 'lifetime', 'assets/activation_codes/valid_codes_lifetime.json'),
+}
+
+def generate_codes(count, days, parts=3, code_type='standard'):
+    """Generate a CodeBatch of count codes valid for days days"""
+    # One UTC timestamp per batch; explicit offset, no DST ambiguity, and
+    # second precision is all an expiry date needs
+    now = datetime.now(timezone.utc)
+    fields = {
+        "days": days,
+        "expiry_date": (now + timedelta(days=days)).isoformat(timespec='seconds'),
+        "status": "active",
+        "created_at": now.isoformat(timespec='seconds')
+    }
+
+    if code_type == 'lifetime':
+        fields["type"] = "lifetime"
+
+    return CodeBatch(make_batch(count, parts=parts), fields)
+
+WRITERS = {'json': write_json, 'jsonl': write_jsonl}
+
+def run(count, days, parts, code_type, out, fmt='json'):
+    """Generate one batch and save it to out as a JSON array or JSON Lines"""
+    codes = generate_codes(count, days, parts, code_type)
+    WRITERS[fmt](out, codes)
+    return codes
+
+def run_preset(name):
+    """Process-pool worker: returns only (count, first code) so codes are not pickled back"""
+    codes = run(*PRESETS[name])
+    return len(codes), codes[0]['code'] if codes else None
+
+def main_all(names=None):
+    """Run several presets (all by default) in parallel worker processes"""
+    names = list(dict.fromkeys(names or PRESETS))  # one process per distinct output
+    workers = min(len(names), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name, (count, _) in zip(names, executor.map(run_preset, names)):
+            print(f"✅ {name}: {count} codes -> {PRESETS[name][-1]}")
+
+def positive_int(value):
+    """argparse type: an int >= 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate GNP activation codes")
+    parser.add_argument('--count', type=positive_int, help="number of codes")
+    parser.add_argument('--days', type=positive_int, help="validity in days")
+    parser.add_argument('--parts', type=positive_int, default=3, help="random 4-char parts after GNP (default: 3)")
+    parser.add_argument('--type', dest='code_type', default='standard', choices=['standard', 'lifetime'])
+    parser.add_argument('--out', help="output JSON file")
+    parser.add_argument('--format', dest='fmt', default='json', choices=list(WRITERS),
+                        help="json: indent=2 array read by the app (default); jsonl: one record per line")
+    parser.add_argument('--preset', action='append', choices=list(PRESETS),
+                        help="run a predefined batch (repeatable)")
+    parser.add_argument('--all', action='store_true', help="run every preset")
+    args = parser.parse_args(argv)
+
+    if args.all or args.preset:
+        main_all(None if args.all else args.preset)
+        return
+
+    if args.count is None or args.days is None or args.out is None:
+        parser.error("--count, --days and --out are required without --preset/--all")
+
+    codes = run(args.count, args.days, args.parts, args.code_type, args.out, args.fmt)
+    print(f"✅ Created {len(codes)} codes ({args.days} days) -> {args.out}")
+    if codes:
+        print(f"   Example: {codes[0]['code']}")
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,7 @@
 سيرفر إدارة التراخيص مع بوت تليجرام للتحكم الكامل
 
 المتطلبات:
-pip install python-telegram-bot flask python-dotenv
+pip install python-telegram-bot flask python-dotenv waitress
 
 طريقة التشغيل:
 1. أنشئ بوت جديد من @BotFather واحصل على التوكن
@@ -15,6 +15,7 @@ pip install python-telegram-bot flask python-dotenv
 الأوامر المتاحة:
 /start - بداية
 /generate [أيام] [اسم] - توليد كود جديد
+/bulk [عدد] [أيام] [اسم] - توليد عدة أكواد دفعة واحدة
 /list - عرض جميع الأكواد
 /info [code] - معلومات كود
 /stop [code] - إيقاف كود
@@ -23,16 +24,23 @@ pip install python-telegram-bot flask python-dotenv
 /stats - إحصائيات
 """
 
+import itertools
 import os
-import random
+import queue
+import secrets
 import sqlite3
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from typing import Optional
 
 from flask import Flask, request, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-import asyncio
 import threading
 
 # ═══════════════════════════════════════════════════════════════
@@ -51,11 +59,322 @@ SERVER_PORT = 5000
 
 # قاعدة البيانات
 DATABASE_FILE = "licenses.db"
+DB_POOL_SIZE = 10  # عدد الاتصالات المفتوحة مسبقاً
+# عدد البروكسيات أمام السيرفر التي يُوثق بـ X-Forwarded-For منها. الافتراضي 0: السيرفر
+# مكشوف مباشرة، وأي عميل يستطيع تزوير هذا الـ header. مثال خلف nginx: TRUSTED_PROXIES=1
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '0'))
+WSGI_THREADS = 8  # threads سيرفر waitress - أقل من DB_POOL_SIZE ليبقى اتصال للبوت وكاتب السجلات
+
+# كاش نتائج /verify الناجحة
+VERIFY_CACHE_SIZE = 10_000
+VERIFY_CACHE_TTL = 60  # ثانية
+VERIFY_LOG_SAMPLE = 10  # تسجيل 1 من كل N تحقق يُخدم من الكاش
+
+# كتابة سجل activation_logs على دفعات من thread في الخلفية
+LOG_BATCH_SIZE = 200
+LOG_FLUSH_INTERVAL = 0.5  # ثانية
+
+# ═══════════════════════════════════════════════════════════════
+# SQL Statements
+# ═══════════════════════════════════════════════════════════════
+# نفس النص في كل استدعاء = نفس الـ prepared statement من كاش الاتصال
+
+SQL_GET_LICENSE = 'SELECT * FROM licenses WHERE license_key = ?'
+SQL_LOAD_LICENSES = '''
+    SELECT license_key, device_id, user_name, plan, expires_at, expires_at_ts, is_active, is_used
+    FROM licenses
+'''
+SQL_GET_EXPIRY = 'SELECT expires_at FROM licenses WHERE license_key = ?'
+SQL_INSERT_LICENSE = '''
+    INSERT INTO licenses (license_key, plan, expires_at, expires_at_ts, user_name, telegram_user_id, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# يتحقق ويفعّل في استعلام واحد (SQLite 3.35+ لـ RETURNING): لا يُرجع صفاً إذا كان
+# الكود غير موجود أو موقوفاً أو منتهياً أو مربوطاً بجهاز آخر
+SQL_ACTIVATE_LICENSE = '''
+    UPDATE licenses 
+    SET device_id = ?, is_used = 1, activated_at = ?
+    WHERE license_key = ? AND is_active = 1 AND expires_at_ts >= ?
+      AND (is_used = 0 OR device_id = ?)
+    RETURNING expires_at, plan, user_name
+'''
+SQL_DEACTIVATE_LICENSE = '''
+    UPDATE licenses 
+    SET device_id = NULL, is_used = 0
+    WHERE license_key = ? AND device_id = ?
+'''
+SQL_SET_ACTIVE = 'UPDATE licenses SET is_active = ? WHERE license_key = ?'
+SQL_SET_EXPIRY = 'UPDATE licenses SET expires_at = ?, expires_at_ts = ? WHERE license_key = ?'
+SQL_INSERT_LOGS = '''
+    INSERT INTO activation_logs (license_key, device_id, action, ip_address, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SQL_RECENT_LOGS = '''
+    SELECT * FROM activation_logs 
+    WHERE license_key = ? 
+    ORDER BY timestamp DESC 
+    LIMIT 5
+'''
+SQL_LIST_LICENSES = '''
+    SELECT license_key, plan, user_name,
+           CASE WHEN is_active THEN '🟢' ELSE '🔴' END AS status,
+           CASE WHEN is_used THEN '✅' ELSE '⚪' END AS used,
+           CASE WHEN expires_at_ts < ? THEN '⏰' ELSE '' END AS expired,
+           substr(expires_at, 1, 10) AS expiry_date
+    FROM licenses 
+    ORDER BY created_at DESC 
+    LIMIT 20
+'''
+SQL_STATS_BY_PLAN = '''
+    SELECT plan,
+           COUNT(*) AS total,
+           SUM(is_active = 1) AS active,
+           SUM(is_used = 1) AS used,
+           SUM(expires_at_ts < CAST(strftime('%s', 'now') AS INTEGER)) AS expired
+    FROM licenses
+    GROUP BY plan
+'''
+
+# تجهيز مسبق لكل اتصال جديد بمعاملات لا تطابق أي صف
+_WARM_STATEMENTS = (
+    (SQL_GET_LICENSE, ('',)),
+    (SQL_GET_EXPIRY, ('',)),
+    (SQL_RECENT_LOGS, ('',)),
+    (SQL_ACTIVATE_LICENSE, (None, None, '', 0, None)),
+    (SQL_DEACTIVATE_LICENSE, ('', None)),
+    (SQL_SET_ACTIVE, (1, '')),
+    (SQL_SET_EXPIRY, (None, None, '')),
+)
+STATEMENT_CACHE_SIZE = 256
 
 # ═══════════════════════════════════════════════════════════════
 # Database Setup
 # ═══════════════════════════════════════════════════════════════
 
+class ConnectionPool:
+    """مجموعة اتصالات SQLite مفتوحة يُعاد استخدامها بدل فتح اتصال لكل طلب"""
+
+    def __init__(self, database, size):
+        self.database = database
+        self.size = size
+        self._idle = queue.Queue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        # autocommit: كل استعلام منفرد يُحفظ مباشرة، والمعاملات صريحة عبر transaction()
+        conn = sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')  # ~64MB
+        for sql, params in _WARM_STATEMENTS:
+            conn.execute(sql, params).fetchall()
+        return conn
+
+    def open(self):
+        """فتح جميع الاتصالات مسبقاً عند بدء السيرفر"""
+        with self._lock:
+            while self._created < self.size:
+                self._idle.put(self._connect())
+                self._created += 1
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        # جميع الاتصالات مشغولة: انتظار أول اتصال يتحرر
+        return self._idle.get()
+
+    def release(self, conn):
+        # لا نعيد اتصالاً بمعاملة مفتوحة لم تُحفظ
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """اتصال داخل BEGIN IMMEDIATE: COMMIT عند الخروج الطبيعي، ROLLBACK عند الخطأ"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+
+    def stats(self):
+        idle = self._idle.qsize()
+        return {'total': self._created, 'idle': idle, 'active': self._created - idle, 'size': self.size}
+
+db_pool = ConnectionPool(DATABASE_FILE, DB_POOL_SIZE)
+
+class VerifyCache:
+    """كاش LRU بمدة صلاحية لنتائج /verify - المفتاح (license_key, device_id)
+
+    لكل كود رقم إصدار يزيده invalidate(): set() لا يكتب نتيجة قُرئت قبل
+    آخر تعديل، حتى لا تعود حالة قديمة للكاش بعد إيقاف الكود أو تمديده.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_license = {}  # license_key -> مفاتيح الكاش لهذا الكود (جهاز لكل مفتاح)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, license_key):
+        """يُقرأ قبل قراءة الترخيص، ثم يُمرر إلى set()"""
+        return self._versions.get(license_key, 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        with self._lock:
+            if self._versions.get(key[0], 0) != version:
+                return  # تغير الكود بعد قراءته
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            self._keys_by_license.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._keys_by_license[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_license[key[0]]
+
+    def invalidate(self, license_key):
+        """حذف كل النتائج المخزنة لهذا الكود (على أي جهاز)"""
+        with self._lock:
+            self._versions[license_key] = self._versions.get(license_key, 0) + 1
+            for key in self._keys_by_license.pop(license_key, ()):
+                del self._entries[key]
+
+verify_cache = VerifyCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL)
+
+@dataclass(slots=True)
+class LicenseRecord:
+    """نسخة في الذاكرة من أعمدة الترخيص التي يقرأها /verify و /info"""
+    license_key: str
+    device_id: Optional[str]  # None حتى أول تفعيل
+    user_name: Optional[str]
+    plan: str
+    expires_at: str
+    expires_at_ts: Optional[int]
+    is_active: int
+    is_used: int
+
+class LicenseIndex:
+    """كل التراخيص في dict حسب الكود - القراءة بدون SQLite، والتعديل بعد الكتابة في القاعدة
+
+    السجلات لا تُعدَّل في مكانها: update() يضع نسخة جديدة، فمن يقرأ سجلاً يرى حالة متسقة.
+    كل من يكتب ترخيصاً يمسك write_lock من قبل الكتابة في القاعدة حتى بعد تعديل الفهرس،
+    فتصل التعديلات للفهرس بنفس ترتيب القاعدة. يُمسك قبل أخذ اتصال من الـ pool، وليس بعده.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def load(self, conn):
+        records = {row[0]: LicenseRecord(*row) for row in conn.execute(SQL_LOAD_LICENSES)}
+        with self._lock:
+            self._records = records
+
+    def get(self, license_key):
+        return self._records.get(license_key)
+
+    def put(self, record):
+        with self._lock:
+            self._records[record.license_key] = record
+
+    def update(self, license_key, **changes):
+        with self._lock:
+            record = self._records.get(license_key)
+            if record is not None:
+                self._records[license_key] = replace(record, **changes)
+
+    def __len__(self):
+        return len(self._records)
+
+license_index = LicenseIndex()
+
+log_queue = queue.Queue()
+_LOG_STOP = object()
+
+def log_action(license_key, device_id, action):
+    """إضافة سطر لـ activation_logs - يُكتب لاحقاً بواسطة log_flusher"""
+    # نفس صيغة CURRENT_TIMESTAMP (UTC) التي كان يضعها SQLite
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    log_queue.put((license_key, device_id, action, request.remote_addr, timestamp))
+
+def _write_logs(rows):
+    with db_transaction() as conn:
+        conn.executemany(SQL_INSERT_LOGS, rows)
+
+def log_flusher():
+    """تجميع السجلات: حتى LOG_BATCH_SIZE سطر أو LOG_FLUSH_INTERVAL ثانية لكل commit"""
+    while True:
+        row = log_queue.get()
+        if row is _LOG_STOP:
+            return
+        rows = [row]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        stop = False
+        while len(rows) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = log_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _LOG_STOP:
+                stop = True
+                break
+            rows.append(row)
+        try:
+            _write_logs(rows)
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to write {len(rows)} activation logs: {e}")
+        if stop:
+            return
+
+log_thread = threading.Thread(target=log_flusher, daemon=True)
+
+def stop_log_writer():
+    """كتابة ما تبقى في الطابور ثم إيقاف الـ thread"""
+    if log_thread.is_alive():
+        log_queue.put(_LOG_STOP)
+        log_thread.join()
+
 def init_database():
     """إنشاء قاعدة البيانات"""
     conn = sqlite3.connect(DATABASE_FILE)
@@ -72,6 +391,7 @@ def init_database():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             activated_at TIMESTAMP,
             expires_at TIMESTAMP,
+            expires_at_ts INTEGER,
             is_active BOOLEAN DEFAULT 1,
             is_used BOOLEAN DEFAULT 0,
             notes TEXT
@@ -89,44 +409,106 @@ def init_database():
         )
     ''')
     
+    # قواعد بيانات قديمة: إضافة expires_at_ts (unix seconds) وملؤه من expires_at
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(licenses)')}
+    if 'expires_at_ts' not in columns:
+        cursor.execute('ALTER TABLE licenses ADD COLUMN expires_at_ts INTEGER')
+    cursor.execute(
+        'SELECT id, expires_at FROM licenses WHERE expires_at_ts IS NULL AND expires_at IS NOT NULL'
+    )
+    cursor.executemany('UPDATE licenses SET expires_at_ts = ? WHERE id = ?', [
+        (int(datetime.fromisoformat(expires_at).timestamp()), license_id)
+        for license_id, expires_at in cursor.fetchall()
+    ])
+    
+    # آخر نشاطات كود معين (/info): بحث بالفهرس بدل المرور على كل السجلات
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_key_time
+        ON activation_logs(license_key, timestamp DESC)
+    ''')
+    
     conn.commit()
+    
+    # تحديث إحصائيات الجداول ليختار SQLite الفهارس الصحيحة
+    cursor.execute('ANALYZE')
     conn.close()
-    print("[OK] Database initialized")
+    
+    db_pool.open()
+    with get_db() as conn:
+        license_index.load(conn)
+    log_thread.start()
+    print(f"[OK] Database initialized ({db_pool.size} pooled connections, {len(license_index)} licenses in memory)")
 
 def get_db():
-    """الحصول على اتصال بقاعدة البيانات"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """الحصول على اتصال من الـ pool (autocommit) - الاستخدام: with get_db() as conn"""
+    return db_pool.connection()
+
+def db_transaction():
+    """اتصال من الـ pool لعدة استعلامات يجب أن تُحفظ معاً - with db_transaction() as conn"""
+    return db_pool.transaction()
 
 # ═══════════════════════════════════════════════════════════════
 # License Code Generator
 # ═══════════════════════════════════════════════════════════════
 
+LICENSE_KEY_RETRIES = 5  # محاولات عند تكرار الكود (UNIQUE)
+BULK_MAX = 100  # أقصى عدد أكواد في /bulk
+_IN_BATCH = 500  # أقصى عدد قيم في استعلام IN واحد
+
+LICENSE_CODE_CHARS = b'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'  # بدون I O 0 1
+# جدول bytes.translate: كل بايت عشوائي -> حرف. 256 من مضاعفات 32 فالتوزيع متساوٍ تماماً
+_LICENSE_CODE_TABLE = bytes(LICENSE_CODE_CHARS[b % len(LICENSE_CODE_CHARS)] for b in range(256))
+
+def generate_license_codes(count):
+    """توليد count كود - Format: GNP-XXXX-XXXX-XXXX
+
+    قراءة واحدة من مولد secrets (آمن تشفيرياً) ثم translate واحد لكل الدفعة.
+    """
+    chars = secrets.token_bytes(12 * count).translate(_LICENSE_CODE_TABLE).decode('ascii')
+    return [
+        f"GNP-{chars[i:i + 4]}-{chars[i + 4:i + 8]}-{chars[i + 8:i + 12]}"
+        for i in range(0, len(chars), 12)
+    ]
+
 def generate_license_code():
     """توليد كود ترخيص فريد - Format: GNP-XXXX-XXXX-XXXX"""
-    chars = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
-    segments = []
-    for _ in range(3):
-        segment = ''.join(random.choices(chars, k=4))
-        segments.append(segment)
-    return f"GNP-{'-'.join(segments)}"
+    return generate_license_codes(1)[0]
+
+def generate_unique_codes(cursor, count):
+    """توليد count كود غير موجود في القاعدة - استعلام IN واحد لكل دفعة بدل استعلام لكل كود"""
+    codes = set()
+    while len(codes) < count:
+        candidates = list(set(generate_license_codes(count - len(codes))) - codes)
+        for i in range(0, len(candidates), _IN_BATCH):
+            batch = candidates[i:i + _IN_BATCH]
+            cursor.execute(
+                f"SELECT license_key FROM licenses WHERE license_key IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            taken = {row[0] for row in cursor.fetchall()}
+            codes.update(code for code in batch if code not in taken)
+    return list(codes)
 
 def create_license(plan='monthly', days=30, user_name=None, telegram_user_id=None, notes=None):
     """إنشاء ترخيص جديد"""
-    license_key = generate_license_code()
     expires_at = datetime.now() + timedelta(days=days)
+    expires_at_ts = int(expires_at.timestamp())
     
-    conn = get_db()
-    cursor = conn.cursor()
+    with license_index.write_lock, get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        INSERT INTO licenses (license_key, plan, expires_at, user_name, telegram_user_id, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (license_key, plan, expires_at, user_name, telegram_user_id, notes))
+        for _ in range(LICENSE_KEY_RETRIES):
+            license_key = generate_license_code()
+            try:
+                cursor.execute(SQL_INSERT_LICENSE, (license_key, plan, expires_at, expires_at_ts,
+                                                    user_name, telegram_user_id, notes))
+                break
+            except sqlite3.IntegrityError:
+                continue  # الكود موجود مسبقاً: جرب كوداً آخر
+        else:
+            raise RuntimeError(f"Could not generate a unique license key in {LICENSE_KEY_RETRIES} attempts")
     
-    conn.commit()
-    conn.close()
+        license_index.put(LicenseRecord(license_key, None, user_name, plan, str(expires_at), expires_at_ts, 1, 0))
     
     return {
         'license_key': license_key,
@@ -135,64 +517,97 @@ def create_license(plan='monthly', days=30, user_name=None, telegram_user_id=Non
         'days': days
     }
 
+def create_licenses_bulk(count, plan='monthly', days=30, user_name=None, telegram_user_id=None, notes=None):
+    """إنشاء count ترخيص في معاملة واحدة (executemany + COMMIT واحد)"""
+    expires_at = datetime.now() + timedelta(days=days)
+    expires_at_ts = int(expires_at.timestamp())
+    
+    with license_index.write_lock:
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+        
+            license_keys = generate_unique_codes(cursor, count)
+            cursor.executemany(SQL_INSERT_LICENSE, (
+                (license_key, plan, expires_at, expires_at_ts, user_name, telegram_user_id, notes)
+                for license_key in license_keys
+            ))
+        
+        for license_key in license_keys:
+            license_index.put(LicenseRecord(license_key, None, user_name, plan, str(expires_at), expires_at_ts, 1, 0))
+    
+    return {
+        'license_keys': license_keys,
+        'plan': plan,
+        'expires_at': expires_at.isoformat(),
+        'days': days
+    }
+
 # ═══════════════════════════════════════════════════════════════
 # Flask API Server
 # ═══════════════════════════════════════════════════════════════
 
 app = Flask(__name__)
+if TRUSTED_PROXIES:
+    # IP العميل الحقيقي من X-Forwarded-For مرة واحدة لكل طلب، قبل وصوله للـ handlers
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 
-@app.route('/activate', methods=['POST'])
-def activate_license():
-    """تفعيل الترخيص"""
-    data = request.json
-    license_key = data.get('license_key', '').upper()
-    device_id = data.get('device_id')
-    
-    if not license_key or not device_id:
-        return jsonify({'success': False, 'message': 'بيانات ناقصة'}), 400
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # البحث عن الترخيص
-    cursor.execute('SELECT * FROM licenses WHERE license_key = ?', (license_key,))
-    license_row = cursor.fetchone()
-    
+_cached_verify_hits = itertools.count(1)
+
+def activation_error(license_row, device_id, now_ts):
+    """سبب رفض التفعيل (الرد وكود HTTP) - None إذا كان الكود صالحاً لهذا الجهاز"""
     if not license_row:
-        conn.close()
         return jsonify({'success': False, 'message': 'كود غير صالح ❌'}), 400
     
     # التحقق من الحالة
     if not license_row['is_active']:
-        conn.close()
         return jsonify({'success': False, 'message': 'الكود موقوف من الإدارة 🚫'}), 423
     
     # التحقق من الصلاحية
-    expires_at = datetime.fromisoformat(license_row['expires_at'])
-    if datetime.now() > expires_at:
-        conn.close()
+    if now_ts > license_row['expires_at_ts']:
         return jsonify({'success': False, 'message': 'الكود منتهي الصلاحية ⏰'}), 410
     
     # التحقق من الجهاز
     if license_row['is_used'] and license_row['device_id'] != device_id:
-        conn.close()
         return jsonify({'success': False, 'message': 'الكود مستخدم على جهاز آخر 📱'}), 403
     
-    # تفعيل الترخيص
-    cursor.execute('''
-        UPDATE licenses 
-        SET device_id = ?, is_used = 1, activated_at = ?
-        WHERE license_key = ?
-    ''', (device_id, datetime.now(), license_key))
+    return None
+
+@app.route('/activate', methods=['POST'])
+def activate_license():
+    """تفعيل الترخيص"""
+    data = request.json
+    license_key = data.get('license_key', '').upper()
+    device_id = data.get('device_id')
     
-    # تسجيل العملية
-    cursor.execute('''
-        INSERT INTO activation_logs (license_key, device_id, action, ip_address)
-        VALUES (?, ?, 'activate', ?)
-    ''', (license_key, device_id, request.remote_addr))
+    if not license_key or not device_id:
+        return jsonify({'success': False, 'message': 'بيانات ناقصة'}), 400
     
-    conn.commit()
-    conn.close()
+    # وقت واحد لكل الطلب: نفس اللحظة في الفحص والتسجيل
+    now = datetime.now()
+    now_ts = now.timestamp()
+    
+    with license_index.write_lock, get_db() as conn:
+        for _ in range(2):
+            # تفعيل الترخيص - الـ UPDATE نفسه ذري، فلا يمكن لجهازين تفعيل نفس الكود معاً
+            # (fetchall حتى ينتهي الاستعلام ويُحفظ التعديل)
+            claimed = conn.execute(SQL_ACTIVATE_LICENSE, (
+                device_id, now, license_key, now_ts, device_id
+            )).fetchall()
+            if claimed:
+                license_row = claimed[0]
+                license_index.update(license_key, device_id=device_id, is_used=1)
+                break
+    
+            # لم يُفعَّل: استعلام تشخيصي واحد لمعرفة السبب
+            error = activation_error(conn.execute(SQL_GET_LICENSE, (license_key,)).fetchone(), device_id, now_ts)
+            if error:
+                return error
+        else:
+            # تغيرت حالة الكود بين الاستعلامين مرتين متتاليتين
+            return jsonify({'success': False, 'message': 'حاول مرة أخرى'}), 409
+    
+    # تسجيل العملية
+    log_action(license_key, device_id, 'activate')
     
     return jsonify({
         'success': True,
@@ -206,48 +621,65 @@ def activate_license():
 def verify_license():
     """التحقق من الترخيص"""
     data = request.json
-    license_key = data.get('license_key', '').upper()
+    license_key = data.get('license_key', '')
     device_id = data.get('device_id')
     
-    conn = get_db()
-    cursor = conn.cursor()
+    # قيم JSON غير نصية لا تطابق أي ترخيص، ولا تصلح مفتاحاً للكاش
+    if not isinstance(license_key, str):
+        return jsonify({'is_active': False, 'message': 'كود غير موجود'})
+    if device_id is not None and not isinstance(device_id, str):
+        return jsonify({'is_active': False, 'message': 'جهاز غير مصرح'})
     
-    cursor.execute('SELECT * FROM licenses WHERE license_key = ?', (license_key,))
-    license_row = cursor.fetchone()
+    license_key = license_key.upper()
+    cache_key = (license_key, device_id)
+    now_ts = time.time()
     
-    if not license_row:
-        conn.close()
+    # نتيجة ناجحة حديثة: لا داعي لقراءة الترخيص من القاعدة
+    cached = verify_cache.get(cache_key)
+    if cached is not None and now_ts <= cached['expires_at_ts']:
+        # عينة فقط من التحققات المتكررة تُسجل (وتقرأ remote_addr)
+        if next(_cached_verify_hits) % VERIFY_LOG_SAMPLE == 0:
+            log_action(license_key, device_id, 'verify')
+        return jsonify({
+            'is_active': True,
+            'expires_at': cached['expires_at'],
+            'plan': cached['plan']
+        })
+    
+    # الإصدار قبل قراءة الترخيص: أي تعديل بعدها يمنع تخزين هذه النتيجة
+    cache_version = verify_cache.version(license_key)
+    
+    # الترخيص من الفهرس في الذاكرة - بدون استعلام
+    lic = license_index.get(license_key)
+    
+    if not lic:
         return jsonify({'is_active': False, 'message': 'كود غير موجود'})
     
     # التحقق من الجهاز
-    if license_row['device_id'] != device_id:
-        conn.close()
+    if lic.device_id != device_id:
         return jsonify({'is_active': False, 'message': 'جهاز غير مصرح'})
     
     # التحقق من الحالة
-    if not license_row['is_active']:
-        conn.close()
+    if not lic.is_active:
         return jsonify({'is_active': False, 'message': 'الكود موقوف'})
     
     # التحقق من الصلاحية
-    expires_at = datetime.fromisoformat(license_row['expires_at'])
-    if datetime.now() > expires_at:
-        conn.close()
+    if now_ts > lic.expires_at_ts:
         return jsonify({'is_active': False, 'message': 'منتهي الصلاحية'})
     
     # تسجيل التحقق
-    cursor.execute('''
-        INSERT INTO activation_logs (license_key, device_id, action, ip_address)
-        VALUES (?, ?, 'verify', ?)
-    ''', (license_key, device_id, request.remote_addr))
+    log_action(license_key, device_id, 'verify')
     
-    conn.commit()
-    conn.close()
+    verify_cache.set(cache_key, {
+        'expires_at': lic.expires_at,
+        'plan': lic.plan,
+        'expires_at_ts': lic.expires_at_ts
+    }, cache_version)
     
     return jsonify({
         'is_active': True,
-        'expires_at': license_row['expires_at'],
-        'plan': license_row['plan']
+        'expires_at': lic.expires_at,
+        'plan': lic.plan
     })
 
 @app.route('/deactivate', methods=['POST'])
@@ -257,25 +689,23 @@ def deactivate_license():
     license_key = data.get('license_key', '').upper()
     device_id = data.get('device_id')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE licenses 
-        SET device_id = NULL, is_used = 0
-        WHERE license_key = ? AND device_id = ?
-    ''', (license_key, device_id))
+    with license_index.write_lock, get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        INSERT INTO activation_logs (license_key, device_id, action, ip_address)
-        VALUES (?, ?, 'deactivate', ?)
-    ''', (license_key, device_id, request.remote_addr))
+        cursor.execute(SQL_DEACTIVATE_LICENSE, (license_key, device_id))
+        if cursor.rowcount > 0:
+            license_index.update(license_key, device_id=None, is_used=0)
+            verify_cache.invalidate(license_key)
     
-    conn.commit()
-    conn.close()
+    log_action(license_key, device_id, 'deactivate')
     
     return jsonify({'success': True})
 
+@app.route('/pool-health', methods=['GET'])
+def pool_health():
+    """حالة الـ connection pool: الاتصالات النشطة / الخاملة / الإجمالي"""
+    return jsonify(db_pool.stats())
+
 # ═══════════════════════════════════════════════════════════════
 # Telegram Bot Commands
 # ═══════════════════════════════════════════════════════════════
@@ -309,12 +739,24 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+def plan_for_days(days):
+    """تحديد الخطة حسب المدة"""
+    if days <= 7:
+        return 'trial'
+    elif days <= 30:
+        return 'monthly'
+    elif days <= 90:
+        return 'quarterly'
+    elif days <= 365:
+        return 'yearly'
+    else:
+        return 'lifetime'
+
 @admin_only
 async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """توليد كود جديد"""
     # الخيارات الافتراضية
     days = 30
-    plan = 'monthly'
     user_name = None
     
     # معالجة المعاملات
@@ -325,17 +767,7 @@ async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if len(args) > 1:
             user_name = ' '.join(args[1:])
     
-    # تحديد الخطة
-    if days <= 7:
-        plan = 'trial'
-    elif days <= 30:
-        plan = 'monthly'
-    elif days <= 90:
-        plan = 'quarterly'
-    elif days <= 365:
-        plan = 'yearly'
-    else:
-        plan = 'lifetime'
+    plan = plan_for_days(days)
     
     # إنشاء الكود
     result = create_license(
@@ -360,39 +792,72 @@ async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(message, parse_mode='Markdown')
 
+@admin_only
+async def bulk_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """توليد عدة أكواد دفعة واحدة"""
+    args = context.args
+    if not args or not args[0].isdigit() or int(args[0]) < 1:
+        await update.message.reply_text("❌ الاستخدام: /bulk 50 30 [اسم]")
+        return
+    
+    requested = int(args[0])
+    count = min(requested, BULK_MAX)
+    # المدة اختيارية: /bulk 5 Ahmed = 30 يوم للمستخدم Ahmed
+    if len(args) > 1 and args[1].isdigit():
+        days = int(args[1])
+        name_args = args[2:]
+    else:
+        days = 30
+        name_args = args[1:]
+    user_name = ' '.join(name_args) or None
+    plan = plan_for_days(days)
+    
+    result = create_licenses_bulk(
+        count,
+        plan=plan,
+        days=days,
+        user_name=user_name,
+        telegram_user_id=update.effective_user.id
+    )
+    
+    message = (
+        f"✅ *تم إنشاء {count} كود!*\n\n"
+        f"📅 المدة: {days} يوم\n"
+        f"📦 الخطة: {plan}\n"
+        f"⏰ ينتهي: {result['expires_at'][:10]}\n"
+    )
+    
+    if user_name:
+        message += f"👤 للمستخدم: {user_name}\n"
+    
+    if requested > count:
+        message += f"⚠️ الحد الأقصى {BULK_MAX} كود في المرة الواحدة (طلبت {requested})\n"
+    
+    message += "\n" + "\n".join(f"`{key}`" for key in result['license_keys'])
+    
+    await update.message.reply_text(message, parse_mode='Markdown')
+
 @admin_only
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """عرض قائمة الأكواد"""
-    conn = get_db()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT * FROM licenses 
-        ORDER BY created_at DESC 
-        LIMIT 20
-    ''')
-    licenses = cursor.fetchall()
-    conn.close()
+        # الرموز والتاريخ تُحسب في SQL، وPython يجمع الأسطر فقط
+        cursor.execute(SQL_LIST_LICENSES, (time.time(),))
+        licenses = cursor.fetchall()
     
     if not licenses:
         await update.message.reply_text("📭 لا توجد أكواد")
         return
     
-    message = "📋 *آخر 20 كود:*\n\n"
-    
-    for lic in licenses:
-        status = "🟢" if lic['is_active'] else "🔴"
-        used = "✅" if lic['is_used'] else "⚪"
-        expires = datetime.fromisoformat(lic['expires_at'])
-        expired = "⏰" if datetime.now() > expires else ""
-        
-        message += (
-            f"{status}{used}{expired} `{lic['license_key']}`\n"
-            f"   └ {lic['plan']} | {expires.strftime('%Y-%m-%d')}"
-        )
-        if lic['user_name']:
-            message += f" | {lic['user_name']}"
-        message += "\n\n"
+    message = "📋 *آخر 20 كود:*\n\n" + "".join(
+        f"{lic['status']}{lic['used']}{lic['expired']} `{lic['license_key']}`\n"
+        f"   └ {lic['plan']} | {lic['expiry_date']}"
+        + (f" | {lic['user_name']}" if lic['user_name'] else "")
+        + "\n\n"
+        for lic in licenses
+    )
     
     await update.message.reply_text(message, parse_mode='Markdown')
 
@@ -405,47 +870,38 @@ async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     license_key = context.args[0].upper()
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM licenses WHERE license_key = ?', (license_key,))
-    lic = cursor.fetchone()
+    lic = license_index.get(license_key)
     
     if not lic:
         await update.message.reply_text("❌ كود غير موجود")
-        conn.close()
         return
     
-    # جلب سجل التفعيلات
-    cursor.execute('''
-        SELECT * FROM activation_logs 
-        WHERE license_key = ? 
-        ORDER BY timestamp DESC 
-        LIMIT 5
-    ''', (license_key,))
-    logs = cursor.fetchall()
-    conn.close()
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    status = "🟢 فعال" if lic['is_active'] else "🔴 موقوف"
-    used = "✅ مستخدم" if lic['is_used'] else "⚪ غير مستخدم"
-    expires = datetime.fromisoformat(lic['expires_at'])
-    days_left = (expires - datetime.now()).days
+        # جلب سجل التفعيلات
+        cursor.execute(SQL_RECENT_LOGS, (license_key,))
+        logs = cursor.fetchall()
+    
+    status = "🟢 فعال" if lic.is_active else "🔴 موقوف"
+    used = "✅ مستخدم" if lic.is_used else "⚪ غير مستخدم"
+    days_left = int((lic.expires_at_ts - time.time()) // 86400)
     
     message = (
         f"🔑 *معلومات الكود*\n\n"
-        f"الكود: `{lic['license_key']}`\n"
+        f"الكود: `{lic.license_key}`\n"
         f"الحالة: {status}\n"
         f"الاستخدام: {used}\n"
-        f"الخطة: {lic['plan']}\n"
-        f"ينتهي: {expires.strftime('%Y-%m-%d')}\n"
+        f"الخطة: {lic.plan}\n"
+        f"ينتهي: {lic.expires_at[:10]}\n"
         f"متبقي: {days_left} يوم\n"
     )
     
-    if lic['user_name']:
-        message += f"المستخدم: {lic['user_name']}\n"
+    if lic.user_name:
+        message += f"المستخدم: {lic.user_name}\n"
     
-    if lic['device_id']:
-        message += f"الجهاز: `{lic['device_id'][:20]}...`\n"
+    if lic.device_id:
+        message += f"الجهاز: `{lic.device_id[:20]}...`\n"
     
     if logs:
         message += "\n📝 *آخر النشاطات:*\n"
@@ -456,7 +912,7 @@ async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
         [
             InlineKeyboardButton(
-                "🔴 إيقاف" if lic['is_active'] else "🟢 تفعيل",
+                "🔴 إيقاف" if lic.is_active else "🟢 تفعيل",
                 callback_data=f"toggle_{license_key}"
             ),
             InlineKeyboardButton("➕ تمديد", callback_data=f"extend_{license_key}"),
@@ -480,20 +936,20 @@ async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     license_key = context.args[0].upper()
     
-    conn = get_db()
-    cursor = conn.cursor()
+    with license_index.write_lock, get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        UPDATE licenses SET is_active = 0 WHERE license_key = ?
-    ''', (license_key,))
+        cursor.execute(SQL_SET_ACTIVE, (0, license_key))
+        updated = cursor.rowcount > 0
+        if updated:
+            license_index.update(license_key, is_active=0)
+            verify_cache.invalidate(license_key)
     
-    if cursor.rowcount > 0:
-        conn.commit()
+    # الرد على تليجرام بعد إرجاع الاتصال للـ pool
+    if updated:
         await update.message.reply_text(f"🔴 تم إيقاف الكود:\n`{license_key}`", parse_mode='Markdown')
     else:
         await update.message.reply_text("❌ كود غير موجود")
-    
-    conn.close()
 
 @admin_only
 async def activate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -504,20 +960,20 @@ async def activate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     license_key = context.args[0].upper()
     
-    conn = get_db()
-    cursor = conn.cursor()
+    with license_index.write_lock, get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-        UPDATE licenses SET is_active = 1 WHERE license_key = ?
-    ''', (license_key,))
+        cursor.execute(SQL_SET_ACTIVE, (1, license_key))
+        updated = cursor.rowcount > 0
+        if updated:
+            license_index.update(license_key, is_active=1)
+            verify_cache.invalidate(license_key)
     
-    if cursor.rowcount > 0:
-        conn.commit()
+    # الرد على تليجرام بعد إرجاع الاتصال للـ pool
+    if updated:
         await update.message.reply_text(f"🟢 تم تفعيل الكود:\n`{license_key}`", parse_mode='Markdown')
     else:
         await update.message.reply_text("❌ كود غير موجود")
-    
-    conn.close()
 
 @admin_only
 async def extend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -529,31 +985,34 @@ async def extend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     license_key = context.args[0].upper()
     days = int(context.args[1])
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT expires_at FROM licenses WHERE license_key = ?', (license_key,))
-    row = cursor.fetchone()
+    # القراءة والتحديث معاً، والرد على تليجرام بعد إغلاق المعاملة
+    with license_index.write_lock:
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute(SQL_GET_EXPIRY, (license_key,))
+            row = cursor.fetchone()
+        
+            if row:
+                current_expiry = datetime.fromisoformat(row['expires_at'])
+                # إذا منتهي، ابدأ من اليوم
+                now = datetime.now()
+                if current_expiry < now:
+                    current_expiry = now
+        
+                new_expiry = current_expiry + timedelta(days=days)
+        
+                cursor.execute(SQL_SET_EXPIRY, (new_expiry.isoformat(), int(new_expiry.timestamp()), license_key))
+        
+        if row:
+            license_index.update(license_key, expires_at=new_expiry.isoformat(),
+                                 expires_at_ts=int(new_expiry.timestamp()))
+            verify_cache.invalidate(license_key)
     
     if not row:
         await update.message.reply_text("❌ كود غير موجود")
-        conn.close()
         return
     
-    current_expiry = datetime.fromisoformat(row['expires_at'])
-    # إذا منتهي، ابدأ من اليوم
-    if current_expiry < datetime.now():
-        current_expiry = datetime.now()
-    
-    new_expiry = current_expiry + timedelta(days=days)
-    
-    cursor.execute('''
-        UPDATE licenses SET expires_at = ? WHERE license_key = ?
-    ''', (new_expiry.isoformat(), license_key))
-    
-    conn.commit()
-    conn.close()
-    
     await update.message.reply_text(
         f"✅ تم تمديد الكود:\n"
         f"`{license_key}`\n\n"
@@ -564,35 +1023,18 @@ async def extend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_only
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """إحصائيات"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # إجمالي الأكواد
-    cursor.execute('SELECT COUNT(*) FROM licenses')
-    total = cursor.fetchone()[0]
-    
-    # الأكواد الفعالة
-    cursor.execute('SELECT COUNT(*) FROM licenses WHERE is_active = 1')
-    active = cursor.fetchone()[0]
-    
-    # الأكواد المستخدمة
-    cursor.execute('SELECT COUNT(*) FROM licenses WHERE is_used = 1')
-    used = cursor.fetchone()[0]
-    
-    # المنتهية
-    cursor.execute('''
-        SELECT COUNT(*) FROM licenses 
-        WHERE expires_at < datetime('now')
-    ''')
-    expired = cursor.fetchone()[0]
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    # حسب الخطة
-    cursor.execute('''
-        SELECT plan, COUNT(*) FROM licenses GROUP BY plan
-    ''')
-    by_plan = cursor.fetchall()
+        # كل الأعداد في مرور واحد على الجدول، مجمعة حسب الخطة
+        cursor.execute(SQL_STATS_BY_PLAN)
+        rows = cursor.fetchall()
     
-    conn.close()
+    by_plan = [(row['plan'], row['total']) for row in rows]
+    total = sum(row['total'] for row in rows)
+    active = sum(row['active'] for row in rows)
+    used = sum(row['used'] for row in rows)
+    expired = sum(row['expired'] for row in rows)
     
     message = (
         "📊 *إحصائيات النظام*\n\n"
@@ -635,22 +1077,24 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif data.startswith('toggle_'):
         license_key = data.replace('toggle_', '')
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT is_active FROM licenses WHERE license_key = ?', (license_key,))
-        row = cursor.fetchone()
+        with license_index.write_lock:
+            with db_transaction() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute(SQL_GET_LICENSE, (license_key,))
+                row = cursor.fetchone()
+            
+                if row:
+                    new_status = 0 if row['is_active'] else 1
+                    cursor.execute(SQL_SET_ACTIVE, (new_status, license_key))
+            
+            if row:
+                license_index.update(license_key, is_active=new_status)
+                verify_cache.invalidate(license_key)
         
         if row:
-            new_status = 0 if row['is_active'] else 1
-            cursor.execute('UPDATE licenses SET is_active = ? WHERE license_key = ?', 
-                         (new_status, license_key))
-            conn.commit()
-            
             status = "🟢 فعال" if new_status else "🔴 موقوف"
             await query.edit_message_text(f"تم تغيير حالة الكود إلى: {status}")
-        
-        conn.close()
     
     elif data.startswith('extend_'):
         license_key = data.replace('extend_', '')
@@ -674,65 +1118,80 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         days = int(parts[0].replace('ext', ''))
         license_key = parts[1]
         
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT expires_at FROM licenses WHERE license_key = ?', (license_key,))
-        row = cursor.fetchone()
-        
-        if row:
-            current = datetime.fromisoformat(row['expires_at'])
-            if current < datetime.now():
-                current = datetime.now()
-            new_expiry = current + timedelta(days=days)
+        with license_index.write_lock:
+            with db_transaction() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute(SQL_GET_EXPIRY, (license_key,))
+                row = cursor.fetchone()
             
-            cursor.execute('UPDATE licenses SET expires_at = ? WHERE license_key = ?',
-                         (new_expiry.isoformat(), license_key))
-            conn.commit()
+                if row:
+                    current = datetime.fromisoformat(row['expires_at'])
+                    now = datetime.now()
+                    if current < now:
+                        current = now
+                    new_expiry = current + timedelta(days=days)
+                
+                    cursor.execute(SQL_SET_EXPIRY, (new_expiry.isoformat(), int(new_expiry.timestamp()), license_key))
             
+            if row:
+                license_index.update(license_key, expires_at=new_expiry.isoformat(),
+                                     expires_at_ts=int(new_expiry.timestamp()))
+                verify_cache.invalidate(license_key)
+        
+        if row:
             await query.edit_message_text(
                 f"✅ تم تمديد {days} يوم\n"
                 f"ينتهي: {new_expiry.strftime('%Y-%m-%d')}"
             )
-        
-        conn.close()
 
 # ═══════════════════════════════════════════════════════════════
 # Main
 # ═══════════════════════════════════════════════════════════════
 
 def run_flask():
-    """تشغيل سيرفر Flask"""
-    app.run(host=SERVER_HOST, port=SERVER_PORT, threaded=True)
+    """تشغيل سيرفر الـ API - waitress إن كان مثبتاً، وإلا سيرفر التطوير الخاص بـ Flask"""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[WARN] waitress not installed, using Flask development server (pip install waitress)")
+        app.run(host=SERVER_HOST, port=SERVER_PORT, threaded=True)
+        return
+    serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=WSGI_THREADS)
 
-def run_bot_in_thread():
-    """تشغيل بوت تليجرام في thread منفصل"""
+def build_bot():
+    """إنشاء تطبيق بوت تليجرام مع كل الأوامر"""
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    
+    # إضافة الأوامر
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("generate", generate_command))
+    application.add_handler(CommandHandler("gen", generate_command))
+    application.add_handler(CommandHandler("bulk", bulk_command))
+    application.add_handler(CommandHandler("list", list_command))
+    application.add_handler(CommandHandler("info", info_command))
+    application.add_handler(CommandHandler("stop", stop_command))
+    application.add_handler(CommandHandler("activate", activate_command))
+    application.add_handler(CommandHandler("extend", extend_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    
+    return application
+
+def run_bot():
+    """تشغيل البوت في الـ main thread حتى Ctrl+C - True إذا توقف بشكل طبيعي"""
     try:
-        # إنشاء event loop جديد للـ thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-        
-        # إضافة الأوامر
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("generate", generate_command))
-        application.add_handler(CommandHandler("gen", generate_command))
-        application.add_handler(CommandHandler("list", list_command))
-        application.add_handler(CommandHandler("info", info_command))
-        application.add_handler(CommandHandler("stop", stop_command))
-        application.add_handler(CommandHandler("activate", activate_command))
-        application.add_handler(CommandHandler("extend", extend_command))
-        application.add_handler(CommandHandler("stats", stats_command))
-        application.add_handler(CallbackQueryHandler(button_callback))
-        
+        application = build_bot()
         print("[OK] Telegram Bot started!")
         print(f"[OK] Bot ready to receive commands from admin ID: {ADMIN_IDS[0]}")
         
-        # تشغيل البوت
-        loop.run_until_complete(application.run_polling())
+        # run_polling يدير event loop واحداً ويلتقط إشارات الإيقاف بنفسه،
+        # وهذا يعمل فقط من الـ main thread
+        application.run_polling()
+        return True
     except Exception as e:
         print(f"[ERROR] Bot failed to start: {e}")
+        return False
 
 def main():
     """نقطة البداية"""
@@ -750,19 +1209,19 @@ def main():
     print(f"   - POST /activate")
     print(f"   - POST /verify")
     print(f"   - POST /deactivate")
+    print(f"   - GET  /pool-health")
     print()
     
-    # تشغيل البوت في thread منفصل
-    bot_thread = threading.Thread(target=run_bot_in_thread, daemon=True)
-    bot_thread.start()
+    # تشغيل البوت - وإن فشل، إبقاء الـ API شغالاً
+    if not run_bot():
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
     
-    # إبقاء البرنامج شغال
-    try:
-        while True:
-            import time
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\n[OK] Shutting down...")
+    print("\n[OK] Shutting down...")
+    stop_log_writer()
 
 if __name__ == '__main__':
     main()
@@ -1,25 +1,30 @@
-import json
 import sys
+from collections import Counter
+
+from code_gen import read_json
 
 sys.stdout.reconfigure(encoding='utf-8')
 
-with open('assets/valid_codes.json', 'r', encoding='utf-8') as f:
-    codes = json.load(f)
+codes = read_json('assets/valid_codes.json')
 
-days_30 = [c for c in codes if c['days'] == 30]
-days_3 = [c for c in codes if c['days'] == 3]
+# مرور واحد: عدد الأكواد لكل مدة + أول كود من كل مدة
+counts = Counter()
+first_by_days = {}
+for c in codes:
+    counts[c['days']] += 1
+    first_by_days.setdefault(c['days'], c)
 
 print("=" * 60)
 print("تحقق من الأكواد في التطبيق")
 print("=" * 60)
 print(f"\nإجمالي الأكواد: {len(codes)}")
-print(f"أكواد 30 يوم: {len(days_30)}")
-print(f"أكواد 3 أيام: {len(days_3)}")
+print(f"أكواد 30 يوم: {counts[30]}")
+print(f"أكواد 3 أيام: {counts[3]}")
 
-if days_3:
-    print(f"\nأكواد 3 أيام تنتهي في: {days_3[0]['expiry_date'].split('T')[0]}")
-if days_30:
-    print(f"أكواد 30 يوم تنتهي في: {days_30[0]['expiry_date'].split('T')[0]}")
+if 3 in first_by_days:
+    print(f"\nأكواد 3 أيام تنتهي في: {first_by_days[3]['expiry_date'].split('T')[0]}")
+if 30 in first_by_days:
+    print(f"أكواد 30 يوم تنتهي في: {first_by_days[30]['expiry_date'].split('T')[0]}")
 
 print("\n" + "=" * 60)
 print("جاهز للبناء!")